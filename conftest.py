@@ -0,0 +1,58 @@
+"""
+conftest
+
+Shared pytest fixtures for the weather application tests.
+"""
+
+from types import MappingProxyType
+
+import pytest
+
+_MOCK_REQUESTS_SUCCESS = {
+    "coord": {"lon": -83, "lat": 39.96},
+    "weather": [
+        {"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}
+    ],
+    "base": "stations",
+    "main": {
+        "temp": 69.76,
+        "feels_like": 63.07,
+        "temp_min": 68,
+        "temp_max": 72,
+        "pressure": 1028,
+        "humidity": 30,
+    },
+    "visibility": 10000,
+    "wind": {"speed": 6.93, "deg": 130},
+    "clouds": {"all": 1},
+    "dt": 1600725366,
+    "sys": {
+        "type": 1,
+        "id": 3656,
+        "country": "US",
+        "sunrise": 1600687147,
+        "sunset": 1600731043,
+    },
+    "timezone": -14400,
+    "id": 4509177,
+    "name": "Testcity",
+    "cod": 200,
+}
+
+_MOCK_REQUESTS_FAILURE = {"cod": "404", "message": "city not found"}
+
+
+@pytest.fixture(scope="session")
+def mock_requests_success():
+    """
+    A read-only view of a successful OpenWeather API response
+    """
+    return MappingProxyType(_MOCK_REQUESTS_SUCCESS)
+
+
+@pytest.fixture(scope="session")
+def mock_requests_failure():
+    """
+    A read-only view of an OpenWeather API response for a location that was not found
+    """
+    return MappingProxyType(_MOCK_REQUESTS_FAILURE)
@@ -5,174 +5,273 @@ This is the testing harness used by pytest to do unit testing on our weather app
 """
 
 import argparse
-from unittest.mock import patch
+import copy
+import logging
+from types import SimpleNamespace
 
 import pytest
-from pytest_mock import MockerFixture
 
 import weather_app
 
-MOCK_REQUESTS_SUCCESS = {
-    "coord": {"lon": -83, "lat": 39.96},
-    "weather": [
-        {"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}
-    ],
-    "base": "stations",
-    "main": {
-        "temp": 69.76,
-        "feels_like": 63.07,
-        "temp_min": 68,
-        "temp_max": 72,
-        "pressure": 1028,
-        "humidity": 30,
-    },
-    "visibility": 10000,
-    "wind": {"speed": 6.93, "deg": 130},
-    "clouds": {"all": 1},
-    "dt": 1600725366,
-    "sys": {
-        "type": 1,
-        "id": 3656,
-        "country": "US",
-        "sunrise": 1600687147,
-        "sunset": 1600731043,
-    },
-    "timezone": -14400,
-    "id": 4509177,
-    "name": "Testcity",
-    "cod": 200,
-}
-
-MOCK_REQUESTS_FAILURE = {"cod": "404", "message": "city not found"}
-
-
-@patch("weather_app.requests")
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-def test_args_success(mock_argparse, mock_requests, capsys):
-    """
-    Tests a standard run with all arguments filled in
-    """
-    mock_requests.get.return_value.status_code = 200
-    mock_requests.get.return_value.json.return_value = MOCK_REQUESTS_SUCCESS
-    mock_argparse.return_value = argparse.Namespace(location="Testcity", api_key="asdf")
-    _ = weather_app.main()
-    assert "Testcity weather" in capsys.readouterr().out
 
-
-@patch("weather_app.requests")
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-def test_env_success(mock_argparse, mock_requests, monkeypatch, capsys):
+@pytest.fixture(scope="session")
+def success_response(mock_requests_success):
     """
-    Tests a run with pulling the API key from environment variables or .env
+    A successful API response built once and shared across the test session
     """
-    monkeypatch.setenv("API_KEY", "abcdefg")
-    mock_requests.get.return_value.status_code = 200
-    mock_requests.get.return_value.json.return_value = MOCK_REQUESTS_SUCCESS
-    mock_argparse.return_value = argparse.Namespace(location="Testcity", api_key=None)
-    _ = weather_app.main()
-    assert "Testcity weather" in capsys.readouterr().out
+    return SimpleNamespace(status_code=200, json=lambda: mock_requests_success)
 
 
-@patch("weather_app.requests")
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-def test_failure(mock_argparse, mock_requests, caplog):
+@pytest.fixture
+def fake_requests(monkeypatch, success_response):
     """
-    Tests how the application handles errors
+    Swaps out the requests session used by the application with a fake that records calls
+    and returns a copy of the successful response. Tests can change fake_requests.response as needed
     """
-    mock_requests.get.return_value.status_code = 404
-    mock_requests.get.return_value.json.return_value = MOCK_REQUESTS_FAILURE
-    mock_argparse.return_value = argparse.Namespace(location="Testcity", api_key="asdf")
-    _ = weather_app.main()
-    assert "ERROR" in caplog.text
+    fake = SimpleNamespace(calls=[], response=copy.copy(success_response))
+
+    def get(*args, **kwargs):
+        fake.calls.append((args, kwargs))
+        return fake.response
 
+    fake.get = get
+    monkeypatch.setattr(weather_app, "_SESSION", fake)
+    return fake
 
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-def test_no_key(mock_argparse, monkeypatch, caplog):
+
+@pytest.fixture
+def set_args(monkeypatch):
     """
-    Tests when no API key is provided to see if it properly errors
+    Returns a function that sets the arguments the application will parse
     """
-    mock_argparse.return_value = argparse.Namespace(location="Testcity", api_key=None)
-    monkeypatch.setenv("API_KEY", "")
-    with pytest.raises(SystemExit):
-        _ = weather_app.main()
-    assert "API key missing" in caplog.text
 
+    def _set_args(**kwargs):
+        namespace = argparse.Namespace(**kwargs)
+        monkeypatch.setattr(
+            weather_app._PARSER, "parse_args", lambda *args, **kw: namespace
+        )
 
-@patch("weather_app.requests")
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-@patch("weather_app.get_input")
-def test_location_input(mock_get_input, mock_argparse, mock_requests, capsys):
+    return _set_args
+
+
+def success_json(request):
     """
-    Tests if it properly gets the location from a raw input
+    Response body for a successful call to the API
     """
-    mock_requests.get.return_value.status_code = 200
-    mock_requests.get.return_value.json.return_value = MOCK_REQUESTS_SUCCESS
-    mock_argparse.return_value = argparse.Namespace(location=None, api_key="asdf")
-    mock_get_input.return_value = "Testcity"
-    _ = weather_app.main()
-    assert "Testcity weather" in capsys.readouterr().out
+    return request.getfixturevalue("mock_requests_success")
 
 
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-def test_invalid_input(mock_argparse, caplog):
+def failure_json(request):
     """
-    Tests when the location provided does not meet the regex requirements
+    Response body for a location the API could not find
     """
-    mock_argparse.return_value = argparse.Namespace(location="abc123", api_key="asdf")
-    with pytest.raises(SystemExit):
-        _ = weather_app.main()
-    assert "is not a valid location" in caplog.text
+    return request.getfixturevalue("mock_requests_failure")
 
 
-@patch("weather_app.requests")
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-def test_api_failure(mock_argparse, mock_requests, caplog):
+def not_json(request):
     """
-    Tests when the API returns a 500 when a server error is returned
+    Response body that cannot be parsed as JSON, such as an error page from a gateway
     """
-    mock_argparse.return_value = argparse.Namespace(location="Testcity", api_key="asdf")
-    mock_requests.get.return_value.status_code = 500
-    _ = weather_app.main()
-    assert "An unknown error has occurred with the OpenWeather API" in caplog.text
+    raise ValueError("Expecting value: line 1 column 1 (char 0)")
 
 
-@patch("weather_app.requests")
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-def test_location_parse_append(mock_argparse, mock_requests, capsys):
+@pytest.mark.parametrize(
+    "level", [logging.ERROR, logging.DEBUG], ids=["error_log", "debug_log"]
+)
+@pytest.mark.parametrize(
+    "location,api_key,status,json,text,query,appid,expected,stream",
+    [
+        # A standard run with all arguments filled in
+        pytest.param(
+            "Testcity",
+            "asdf",
+            200,
+            success_json,
+            "",
+            "Testcity",
+            "asdf",
+            "Testcity weather",
+            "out",
+            id="args",
+        ),
+        # Pulling the API key from environment variables or .env
+        pytest.param(
+            "Testcity",
+            None,
+            200,
+            success_json,
+            "",
+            "Testcity",
+            "abcdefg",
+            "Testcity weather",
+            "out",
+            id="env",
+        ),
+        # Getting the location from a raw input
+        pytest.param(
+            None,
+            "asdf",
+            200,
+            success_json,
+            "",
+            "Testcity",
+            "asdf",
+            "Testcity weather",
+            "out",
+            id="input",
+        ),
+        # Appending US to the end of a location when needed
+        pytest.param(
+            "Testcity NY",
+            "asdf",
+            200,
+            success_json,
+            "",
+            "Testcity,NY,US",
+            "asdf",
+            "Testcity weather",
+            "out",
+            id="append_us",
+        ),
+        # The API could not find the location
+        pytest.param(
+            "Testcity",
+            "asdf",
+            404,
+            failure_json,
+            "",
+            "Testcity",
+            "asdf",
+            "ERROR",
+            "log",
+            id="404",
+        ),
+        # The API returns a server error
+        pytest.param(
+            "Testcity",
+            "asdf",
+            500,
+            success_json,
+            "",
+            "Testcity",
+            "asdf",
+            "An unknown error has occurred with the OpenWeather API",
+            "log",
+            id="500",
+        ),
+        # A gateway in front of the API returns an error page that is not JSON
+        pytest.param(
+            "Testcity",
+            "asdf",
+            502,
+            not_json,
+            "<html>Bad Gateway</html>",
+            "Testcity",
+            "asdf",
+            "An unknown error has occurred with the OpenWeather API: <html>Bad Gateway</html>",
+            "log",
+            id="502_not_json",
+        ),
+    ],
+)
+def test_main(
+    location,
+    api_key,
+    status,
+    json,
+    text,
+    query,
+    appid,
+    expected,
+    stream,
+    level,
+    fake_requests,
+    set_args,
+    request,
+    monkeypatch,
+    capsys,
+    caplog,
+):
     """
-    Tests if it properly appends US to the end of a location when needed. We assume it returns back a proper response
+    Tests runs of the application that make a call to the API, both with and without debug logging
     """
-    mock_requests.get.return_value.status_code = 200
-    mock_requests.get.return_value.json.return_value = MOCK_REQUESTS_SUCCESS
-    mock_argparse.return_value = argparse.Namespace(
-        location="Testcity NY", api_key="asdf"
-    )
+    caplog.set_level(level, logger=weather_app.logger.name)
+    monkeypatch.setenv("API_KEY", "abcdefg")
+    monkeypatch.setattr(weather_app, "get_input", lambda text: "Testcity")
+    fake_requests.response.status_code = status
+    fake_requests.response.json = lambda: json(request)
+    fake_requests.response.text = text
+    set_args(location=location, api_key=api_key)
     _ = weather_app.main()
-    assert "Testcity weather" in capsys.readouterr().out
+    _, kwargs = fake_requests.calls[-1]
+    assert kwargs["params"]["q"] == query
+    assert kwargs["params"]["appid"] == appid
+    if stream == "out":
+        assert expected in capsys.readouterr().out
+    else:
+        assert expected in caplog.text
 
 
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-@patch("weather_app.get_input")
-def test_location_empty(mock_get_input, mock_argparse, caplog):
+@pytest.mark.parametrize(
+    "location,api_key,expected",
+    [
+        # No API key is provided
+        pytest.param("Testcity", None, "API key missing", id="no_key"),
+        # The location is not only letters
+        pytest.param("abc123", "asdf", "is not a valid location", id="invalid"),
+        # The location has letters outside of ASCII
+        pytest.param("Zürich", "asdf", "is not a valid location", id="non_ascii"),
+        # The location is left empty
+        pytest.param("", "asdf", "A location is required", id="empty"),
+        # The location has too many items to split
+        pytest.param(
+            "A B C D E",
+            "asdf",
+            "The location provided has too many items",
+            id="too_many",
+        ),
+    ],
+)
+def test_main_exits(location, api_key, expected, set_args, monkeypatch, caplog):
     """
-    Tests if the location is left empty
+    Tests runs of the application that should error out and exit before calling the API
     """
-    mock_argparse.return_value = argparse.Namespace(location="", api_key="asdf")
-    mock_get_input.return_value = ""
+    monkeypatch.setenv("API_KEY", "")
+    monkeypatch.setattr(weather_app, "get_input", lambda text: "")
+    set_args(location=location, api_key=api_key)
     with pytest.raises(SystemExit):
         _ = weather_app.main()
-    assert "A location is required" in caplog.text
+    assert expected in caplog.text
 
 
-@patch("weather_app.argparse.ArgumentParser.parse_args")
-@patch("weather_app.get_input")
-def test_location_too_many_items(mock_get_input, mock_argparse, caplog):
+@pytest.fixture
+def clear_env_cache():
     """
-    Tests if the input is an invalid state with too many items to split
+    Makes sure the cached .env load starts and ends each test fresh
     """
-    mock_argparse.return_value = argparse.Namespace(
-        location="A B C D E", api_key="asdf"
-    )
+    weather_app._load_env.cache_clear()
+    yield
+    weather_app._load_env.cache_clear()
+
+
+def test_env_loaded_once(fake_requests, set_args, clear_env_cache, monkeypatch, capsys):
+    """
+    Tests that the .env file is only read once when the API key is not in the environment
+    """
+    calls = []
+
+    def load_dotenv():
+        calls.append(None)
+        monkeypatch.setenv("API_KEY", "abcdefg")
+
+    monkeypatch.delenv("API_KEY", raising=False)
+    monkeypatch.setattr(weather_app.dotenv, "load_dotenv", load_dotenv)
+    set_args(location="Testcity", api_key=None)
+    _ = weather_app.main()
+    assert "Testcity weather" in capsys.readouterr().out
+
+    # The .env file has already been loaded, so it should not be read again
+    monkeypatch.delenv("API_KEY")
     with pytest.raises(SystemExit):
         _ = weather_app.main()
-    assert "The location provided has too many items" in caplog.text
+    assert len(calls) == 1
@@ -6,9 +6,11 @@ This is a small sample application that pulls data from openweathermap.org
 """
 import logging
 import argparse
+import functools
 import os
-import re
+import string
 import sys
+from typing import List, Optional, Tuple
 
 import dotenv
 import requests
@@ -20,12 +22,16 @@ LOGGING_LEVEL = logging.ERROR
 
 BASE_API_URL = "https://api.openweathermap.org/data/2.5/weather"
 
-logging.basicConfig(
-    stream=sys.stdout, level=logging.WARN, format="%(levelname)s: %(message)s"
-)
+# Reuse one session so repeated calls can share a pooled connection to the API
+_SESSION = requests.Session()
+
+# Only set up the root handler if nothing else (ie. pytest) has configured logging already
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        stream=sys.stdout, level=logging.WARN, format="%(levelname)s: %(message)s"
+    )
 logger = logging.getLogger(__name__)
 logger.setLevel(LOGGING_LEVEL)
-logger.info("Starting weather application")
 
 
 def parse_options() -> argparse.ArgumentParser:
@@ -62,6 +68,42 @@ def parse_options() -> argparse.ArgumentParser:
     return parser
 
 
+# The parser never changes, so it is built once at import instead of on every run
+_PARSER = parse_options()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_env() -> None:
+    """
+    Loads the .env file into the environment. The lru_cache makes this run only once per
+    process, so the file is not read again on later calls
+    """
+
+    dotenv.load_dotenv()
+
+
+def validate_location(location: str) -> Tuple[List[str], Optional[str]]:
+    """
+    Some field validation for location. Returns the pieces of the location along with an
+    error message if the location is not valid, otherwise None
+    """
+
+    # Validate that there is anything before splitting up the location
+    if not location or location.isspace():
+        return [], "A location is required."
+    tokens = location.split()
+    # Make sure that there aren't too many values
+    if len(tokens) > 3:
+        return tokens, "The location provided has too many items"
+    # All fields should be only ASCII letters. Stripping them off both ends leaves nothing
+    # behind unless there is some other character in the field
+    for item in tokens:
+        if item.strip(string.ascii_letters):
+            return tokens, f"{location} is not a valid location."
+
+    return tokens, None
+
+
 def get_input(text) -> str:
     """
     Small function that takes input and returns it. This is mainly so that we can do testing
@@ -83,15 +125,18 @@ def main() -> None:
         - Reorganizes fields to be used with API and calls the API
         - Parses out temperature and returns to end user
     """
+    logger.info("Starting weather application")
+
     # Parse the options passed
-    parser = parse_options()
-    options = parser.parse_args()
+    options = _PARSER.parse_args()
 
     if options.api_key:
         api_key = options.api_key
     else:
-        dotenv.load_dotenv()
         api_key = os.getenv("API_KEY")
+        if api_key is None:
+            _load_env()
+            api_key = os.getenv("API_KEY")
 
     if not api_key:
         logger.error(
@@ -99,50 +144,44 @@ def main() -> None:
         )
         sys.exit(1)
 
-    print(api_key)
     if options.location:
         location = options.location
     else:
         location = get_input("Where are you? ")
 
-    # Some field validation for location
-    try:
-        # Validate that there is anything
-        if not len(location.split()):
-            raise Exception("A location is required.")
-        # Make sure that there aren't too many values
-        if len(location.split()) > 3:
-            raise Exception("The location provided has too many items")
-        # All fields should be only letters
-        for item in location.split():
-            if not re.match(r"^[a-zA-Z]*$", item):
-                raise Exception(f"{location} is not a valid location.")
-    except Exception as e:
-        logger.error(f"A validation error has occurred: {str(e)}")
-        parser.print_help()
+    tokens, error = validate_location(location)
+    if error:
+        logger.error(f"A validation error has occurred: {error}")
+        _PARSER.print_help()
         sys.exit(1)
 
     # If location is city and state, tack on US as the default country
-    if len(location.split()) == 2:
-        location += " US"
+    if len(tokens) == 2:
+        tokens.append("US")
+        location = " ".join(tokens)
 
     # Make the call and parse out the temperature
-    response = requests.get(
-        f"{BASE_API_URL}?q={','.join(location.split())}&appid={api_key}&units=imperial"
+    response = _SESSION.get(
+        BASE_API_URL,
+        params={"q": ",".join(tokens), "appid": api_key, "units": "imperial"},
     )
-    logger.debug(f"Response: {response.json()}")
+    # Errors from anything in front of the API (ie. a gateway) may not be JSON
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = response.text
+    logger.debug("Response: %s", payload)
     if response.status_code == 200:
         logger.info("Successfully retrieved data")
-        temps = int(response.json()["main"]["temp"])
-        print(f"{location.split()[0]} weather:")
+        temps = int(payload["main"]["temp"])
+        print(f"{tokens[0]} weather:")
         print(f"{str(temps)} degrees Fahrenheit")
     elif response.status_code == 404:
         logger.error(f"Could not find any location for {location}")
     else:
         logger.error(
-            f"An unknown error has occurred with the OpenWeather API: {str(response.json())}"
+            f"An unknown error has occurred with the OpenWeather API: {str(payload)}"
         )
 
-
-if "__main__" in __name__:
+if __name__ == "__main__":
     main()